@@ -0,0 +1,179 @@
+"""
+Logique partagée des pages Streamlit : parsing des tickers, récupération
+des top holdings via yfinance (avec cache) et construction des liens
+Stock ↔ ETF.
+
+Les fonctions en cache vivent ici, dans un seul module, pour que toutes
+les pages partagent les mêmes entrées `st.cache_data` / `st.cache_resource`.
+"""
+import functools
+import io
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+
+# Copy-on-write : les sous-DataFrames ne sont copiés qu'en cas de modification
+# (comportement par défaut à partir de pandas 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+
+# Streamlit relance tout le script à chaque interaction : on mémorise le parsing.
+@functools.lru_cache(maxsize=32)
+def parse_tickers(text: str) -> tuple:
+    if not text:
+        return ()
+    return tuple(t.strip().upper() for t in text.split(",") if t.strip())
+
+
+# Colonnes yfinance → noms internes. Couvre l'ancien format
+# ('symbol', 'holdingName', 'holdingPercent') et le récent
+# (index 'Symbol', 'Name', 'Holding Percent').
+HOLDINGS_COLUMNS = [
+    ("stock", re.compile(r"^symbol$")),
+    ("stock_name", re.compile(r"name")),
+    ("weight_pct", re.compile(r"percent")),
+]
+
+# Les top holdings changent au plus une fois par jour.
+HOLDINGS_TTL = 24 * 3600
+
+
+# Yahoo limite le débit : on réessaie avec un back-off exponentiel
+# (attentes de 0.5, 1, 2 puis 4 s avant d'abandonner)
+RATE_LIMIT_RETRIES = 5
+
+
+@st.cache_resource(ttl=HOLDINGS_TTL, show_spinner=False)
+def _ticker(symbol: str) -> yf.Ticker:
+    """Objet yf.Ticker partagé entre sessions (réutilise la session HTTP de yfinance)."""
+    return yf.Ticker(symbol)
+
+
+# cache_data est global à toutes les sessions : les holdings ne dépendent
+# pas de l'utilisateur, donc un ETF déjà chargé sert à tout le monde.
+@st.cache_data(ttl=HOLDINGS_TTL, show_spinner=False)
+def get_etf_top_holdings(etf_symbol: str) -> pd.DataFrame:
+    """
+    Récupère les top holdings d'un ETF via yfinance.
+    Utilise Ticker.funds_data.top_holdings (voir docs yfinance).
+
+    Appelée depuis des threads : aucun appel `st.*` ici, les erreurs
+    remontent à l'appelant (et ne sont pas mises en cache).
+    """
+    ticker = _ticker(etf_symbol)
+    for attempt in range(RATE_LIMIT_RETRIES):
+        try:
+            top = ticker.funds_data.top_holdings
+            break
+        except YFRateLimitError:
+            if attempt == RATE_LIMIT_RETRIES - 1:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+    if top is None or top.empty:
+        return pd.DataFrame()
+
+    df = top.reset_index()
+
+    # Un seul passage : on ne garde que les colonnes reconnues, renommées
+    rename_map = {}
+    for col in df.columns:
+        canon = next((name for name, pat in HOLDINGS_COLUMNS if pat.search(str(col).lower())), None)
+        if canon is not None and canon not in rename_map.values():
+            rename_map[col] = canon
+    df = df.rename(columns=rename_map)[list(rename_map.values())]
+
+    # Poids numérique (Float32 nullable) ; si entre 0 et 1 → on le convertit en %
+    if "weight_pct" in df.columns:
+        # Mise à l'échelle en float64, puis un seul cast (évite les artefacts float32)
+        weight = pd.to_numeric(df["weight_pct"], errors="coerce")
+        df["weight_pct"] = (weight * (100 if weight.le(1.0).all() else 1)).astype("Float32")
+
+    df["ETF"] = etf_symbol.upper()
+    return df
+
+
+def build_stock_etf_mapping(etfs, stocks_filter):
+    """
+    Construit un DataFrame avec les liens Stock ↔ ETF
+    sur base des top holdings yfinance.
+    """
+    # ETF en double (ex. "SPY, SPY") : un seul fetch, sinon les poids seraient additionnés
+    etfs = list(dict.fromkeys(etfs))
+    if not etfs:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Une case par ETF : l'ordre des résultats suit celui de la liste d'ETF
+    all_frames = [None] * len(etfs)
+    errors = []
+    mask_set = frozenset(stocks_filter) if stocks_filter else None
+
+    # Les appels yfinance sont bloquants (I/O réseau) → on les lance en parallèle.
+    # Les st.warning restent dans le thread principal (Streamlit n'est pas thread-safe).
+    with ThreadPoolExecutor(max_workers=min(8, len(etfs))) as ex:
+        futures = {ex.submit(get_etf_top_holdings, etf): i for i, etf in enumerate(etfs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            etf = etfs[i]
+            try:
+                df_etf = future.result()
+            except Exception as e:
+                errors.append(f"❗ Impossible de récupérer les top holdings pour {etf.upper()} : {e}")
+                continue
+            if df_etf.empty:
+                errors.append(f"⚠️ Aucun top holding trouvé (ou pas reconnu comme ETF) pour {etf.upper()}.")
+                continue
+            # Filtre les stocks avant la concaténation (le cache reste sans filtre)
+            if mask_set is not None:
+                df_etf = df_etf[df_etf["stock"].isin(mask_set)]
+            all_frames[i] = df_etf
+
+    for msg in errors:
+        st.warning(msg)
+
+    all_frames = [f for f in all_frames if f is not None]
+    if not all_frames:
+        return pd.DataFrame(), pd.DataFrame()
+
+    holdings_filtered = pd.concat(all_frames, ignore_index=True, sort=False)
+    if holdings_filtered.empty:
+        return holdings_filtered, pd.DataFrame()
+
+    # Tri
+    if "weight_pct" in holdings_filtered.columns:
+        holdings_filtered = holdings_filtered.sort_values(
+            ["stock", "weight_pct"], ascending=[True, False]
+        )
+    else:
+        holdings_filtered = holdings_filtered.sort_values(["stock", "ETF"])
+
+    # Matrice pivot stock x ETF
+    if "weight_pct" in holdings_filtered.columns:
+        # ETF dédoublonnés plus haut → (stock, ETF) est unique : groupby + unstack
+        # sur des catégories évite la machinerie générique de pivot_table
+        keys = holdings_filtered[["stock", "ETF"]].astype("category")
+        pivot = (
+            holdings_filtered["weight_pct"]
+            .groupby([keys["stock"], keys["ETF"]], observed=True, sort=False)
+            .sum()
+            .unstack("ETF", fill_value=0.0)
+        )
+    else:
+        pivot = pd.DataFrame()
+
+    return holdings_filtered, pivot
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Sérialise en CSV directement en bytes (writer C++ d'Arrow), sans passer par une str."""
+    buf = io.BytesIO()
+    pv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue()